@@ -1,33 +1,66 @@
 import os
 import io
-import json
+import asyncio
 import re
 import logging
+import tempfile
+import time
 import urllib.parse
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 
+import aiofiles
+import numpy as np
+import orjson
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, create_engine, Session, select, delete
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 
 # --- 1. CONFIGURATION ---
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///local.db")
 DATA_DIR = os.getenv("DATA_DIR", "/app/data")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Adapte l'URL pour psycopg2
-engine = create_engine(DATABASE_URL.replace("postgres://", "postgresql+psycopg2://"), echo=False)
+SQLALCHEMY_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://")
+
+# Pool de connexions persistantes : évite une connexion TCP/TLS + authentification par requête
+engine_options = {}
+if not SQLALCHEMY_URL.startswith("sqlite"):
+    engine_options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+engine = create_engine(SQLALCHEMY_URL, echo=False, **engine_options)
+
+# INSERT ... ON CONFLICT : même API pour PostgreSQL et pour la base SQLite locale
+if SQLALCHEMY_URL.startswith("sqlite"):
+    from sqlalchemy.dialects.sqlite import insert as upsert_insert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert_insert
+
+class ORJSONResponse(JSONResponse):
+    """Réponse JSON sérialisée avec orjson (bien plus rapide que le module json standard)"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
 
 app = FastAPI(
     title="Hotel RM API - v8.0 (Multi-Hotel)",
-    description="API complète pour la gestion des données hôtelières et la simulation tarifaire."
+    description="API complète pour la gestion des données hôtelières et la simulation tarifaire.",
+    default_response_class=ORJSONResponse
 )
 
 # --- 2. MIDDLEWARE CORS CORRIGÉ ---
@@ -53,11 +86,32 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Compression gzip des réponses volumineuses (JSON de planning, simulations longues).
+# Les fichiers .xlsx sont déjà des archives zip : inutile de les recompresser.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=4096,
+    compresslevel=5,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + (XLSX_MEDIA_TYPE,)
+)
+
 # Middleware de gestion d'erreurs global
 @app.middleware("http")
 async def catch_exceptions_middleware(request, call_next):
     try:
-        response = await call_next(request)
+        # Rejet des uploads trop volumineux d'après Content-Length, avant la lecture du corps
+        content_length = request.headers.get("content-length", "")
+        if (
+            request.url.path.startswith("/upload/")
+            and content_length.isdigit()
+            and int(content_length) > MAX_UPLOAD_BYTES
+        ):
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"Fichier trop volumineux (maximum {MAX_UPLOAD_BYTES} octets)"}
+            )
+        else:
+            response = await call_next(request)
         
         # Ajout des headers CORS pour toutes les réponses
         response.headers["Access-Control-Allow-Origin"] = "*"
@@ -91,28 +145,39 @@ async def preflight_handler(request, rest_of_path: str):
     )
 
 # --- 3. FONCTIONS UTILITAIRES ---
+JOURS_SEMAINE = ["lun", "mar", "mer", "jeu", "ven", "sam", "dim"]
+
+# Expressions régulières du parsing, compilées une seule fois
+NON_DIGIT_RE = re.compile(r'[^\d]')
+NON_PRICE_CHAR_RE = re.compile(r'[^\d.]')
+PRICE_RE = re.compile(r'\d+\.?\d*|\.\d+')
+
 def decode_hotel_id(hotel_id: str) -> str:
     """Décode les IDs d'hôtel avec des caractères encodés"""
     return urllib.parse.unquote(hotel_id).lower().strip()
 
-def safe_int(val) -> int:
-    """Tente de convertir une valeur en entier. Gère les 'X' et formats spéciaux."""
-    if pd.isna(val) or val is None:
-        return 0
-    
-    try:
-        if isinstance(val, str):
-            val = val.strip().upper()
-            if val == 'X' or val == 'N/A' or val == '-' or val == '':
-                return 0
-            # Extraction des chiffres seulement
-            val = re.sub(r'[^\d]', '', val)
-            if not val:
-                return 0
-                
-        return int(float(str(val).replace(',', '.')))
-    except (ValueError, TypeError, AttributeError):
-        return 0
+@lru_cache(maxsize=1024)
+def hotel_data_path(hotel_id: str) -> str:
+    """Chemin du fichier de planning d'un hôtel (mis en cache, l'ID doit être déjà décodé)"""
+    return os.path.join(DATA_DIR, f'{hotel_id}_data.json')
+
+# Caches de planning : une seule version par hôtel, hotel_id -> ((mtime_ns, taille), valeur).
+# Un nouvel upload change la clé et remplace l'entrée, l'ancienne version est libérée.
+# Les octets bruts (/data) et le dict décodé (simulation) sont mis en cache séparément
+_hotel_data_cache: Dict[str, tuple] = {}
+_hotel_bytes_cache: Dict[str, tuple] = {}
+
+def format_date_display(d: date) -> str:
+    """Formate une date pour l'affichage, avec le jour de la semaine en français (ex: 'lun 06/10')"""
+    return f"{JOURS_SEMAINE[d.weekday()]} {d.day:02d}/{d.month:02d}"
+
+def parse_request_date(value: str) -> date:
+    """Parse une date de requête au format YYYY-MM-DD (jour/mois sans zéro initial acceptés)"""
+    # Chemin rapide pour la forme complète uniquement : fromisoformat accepte aussi '20251006'
+    # ou '2025-W41-1', que strptime refuse, mais rejette '2025-10-2'
+    if len(value) == 10 and value[4] == '-' and value[7] == '-' and value.isascii():
+        return date.fromisoformat(value)
+    return datetime.strptime(value, '%Y-%m-%d').date()
 
 # --- 4. MODÈLES DE DONNÉES ---
 class Hotel(SQLModel, table=True):
@@ -147,7 +212,94 @@ def on_startup():
     os.makedirs(DATA_DIR, exist_ok=True)
     logger.info("Application démarrée avec succès")
 
+@app.on_event('shutdown')
+def on_shutdown():
+    engine.dispose()
+    logger.info("Connexions à la base de données fermées")
+
 # --- 6. FONCTIONS DE PARSING ---
+def parse_stock_cells(cells: np.ndarray) -> np.ndarray:
+    """
+    Convertit un tableau de cellules de stock en entiers. 'X', 'N/A', '-' et '' donnent 0,
+    le texte ne garde que ses chiffres, les nombres sont tronqués vers zéro (vide ou NaN : 0)
+    """
+    values = pd.Series(cells, dtype=object)
+    is_text = np.fromiter((isinstance(v, str) for v in cells), dtype=bool, count=len(cells))
+    stock = np.zeros(len(cells))
+    
+    # Cellules texte : on ne garde que les chiffres ('X', 'N/A', '-' et '' donnent 0)
+    digits = values[is_text].str.replace(NON_DIGIT_RE, '', regex=True)
+    has_digits = (digits != '').to_numpy(dtype=bool)
+    text_stock = np.zeros(len(digits))
+    text_stock[has_digits] = digits[has_digits].to_numpy(dtype=object).astype(float)
+    stock[is_text] = text_stock
+    
+    # Cellules numériques : troncature vers zéro, comme int(float(...))
+    stock[~is_text] = pd.to_numeric(values[~is_text], errors='coerce')
+    
+    stock[~np.isfinite(stock)] = 0
+    return np.trunc(stock).astype(np.int64)
+
+def parse_price_cells(cells: np.ndarray) -> np.ndarray:
+    """Convertit un tableau de cellules de prix en float (NaN si vide ou illisible)"""
+    values = pd.Series(cells, dtype=object)
+    present = values.notna().to_numpy()
+    prices = np.full(len(values), np.nan)
+    
+    # Virgule décimale française, puis suppression de tout ce qui n'est ni chiffre ni point
+    cleaned = (
+        values[present].astype(str)
+        .str.replace(',', '.', regex=False)
+        .str.replace(NON_PRICE_CHAR_RE, '', regex=True)
+    )
+    # Seules les chaînes que float() accepte sont converties (ex: '1.2.3' ou '' restent vides)
+    valid = cleaned.str.fullmatch(PRICE_RE).to_numpy(dtype=bool)
+    present_prices = np.full(len(cleaned), np.nan)
+    present_prices[valid] = cleaned[valid].to_numpy(dtype=object).astype(float)
+    prices[present] = present_prices
+    return prices
+
+def parse_header_dates(header_row: np.ndarray) -> list:
+    """Convertit la ligne d'en-tête en colonnes de date, par lots plutôt que cellule par cellule"""
+    header = pd.Series(header_row[3:], index=range(3, len(header_row)), dtype=object)
+    header = header[header.notna()]
+    
+    is_text = header.map(lambda v: isinstance(v, str)).astype(bool)
+    is_slashed = is_text & header.where(is_text, '').str.contains('/', regex=False)
+    is_stamp = header.map(lambda v: isinstance(v, (datetime, pd.Timestamp))).astype(bool)
+    is_serial = header.map(lambda v: isinstance(v, (int, float))).astype(bool)
+    is_other = ~(is_slashed | is_stamp | is_serial)
+    
+    # Dates au format français DD/MM/YY
+    parts = header[is_slashed].str.split('/')
+    parts = parts[parts.str.len() == 3]
+    slashed_dates = '20' + parts.str[2] + '-' + parts.str[1].str.zfill(2) + '-' + parts.str[0].str.zfill(2)
+    
+    # Dates déjà typées par pandas/openpyxl
+    stamp_dates = pd.to_datetime(header[is_stamp], errors='coerce').dt.strftime('%Y-%m-%d')
+    
+    # Numéros de série Excel
+    serial_dates = pd.to_datetime(
+        header[is_serial].astype(float), unit='D', origin=pd.Timestamp(1899, 12, 30), errors='coerce'
+    ).dt.strftime('%Y-%m-%d')
+    
+    # Tout autre format reconnu par pandas
+    other_dates = pd.to_datetime(
+        header[is_other].astype(str), dayfirst=True, format='mixed', errors='coerce'
+    ).dt.strftime('%Y-%m-%d')
+    
+    dates = pd.concat([slashed_dates, stamp_dates, serial_dates, other_dates]).dropna().sort_index()
+    dates = dates[dates.str.startswith('20')]
+    
+    unparsed = header.index.difference(dates.index)
+    if len(unparsed):
+        logger.warning(f"Impossible de parser {len(unparsed)} date(s) d'en-tête")
+        # Le détail des cellules n'est formaté que si le niveau DEBUG est actif
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Cellules d'en-tête ignorées: {header[unparsed].tolist()}")
+    
+    return [{'index': j, 'date': d} for j, d in dates.items()]
+
 def parse_sheet_to_structure(df: pd.DataFrame) -> dict:
     """
     Nouveau parser adapté à la structure réelle des fichiers CSV
@@ -160,87 +312,61 @@ def parse_sheet_to_structure(df: pd.DataFrame) -> dict:
     source_info = str(df.iloc[0, 0]) if df.shape[0] > 0 and df.shape[1] > 0 else "Source inconnue"
 
     # Détection des colonnes de date (première ligne)
-    header_row = df.iloc[0].tolist()
-    date_cols = []
+    date_cols = parse_header_dates(df.iloc[0].to_numpy(dtype=object))
+
+    # Conversion unique en tableau NumPy : évite un df.iloc par ligne
+    cells = df.to_numpy(dtype=object)
+    date_indices = np.array([dc['index'] for dc in date_cols], dtype=np.intp)
+    date_keys = [dc['date'] for dc in date_cols]
     
-    for j, col_value in enumerate(header_row):
-        if pd.isna(col_value) or j < 3:
-            continue
-            
-        date_str = None
-        try:
-            # Gestion des dates au format français DD/MM/YYYY
-            if isinstance(col_value, str) and '/' in col_value:
-                day, month, year = col_value.split('/')
-                date_str = f"20{year}-{month.zfill(2)}-{day.zfill(2)}"
-            elif isinstance(col_value, (datetime, pd.Timestamp)):
-                date_str = col_value.strftime('%Y-%m-%d')
-            elif isinstance(col_value, (int, float)):
-                date_str = (datetime(1899, 12, 30) + timedelta(days=col_value)).strftime('%Y-%m-%d')
-            else:
-                date_str = pd.to_datetime(str(col_value), dayfirst=True).strftime('%Y-%m-%d')
-                
-            if date_str and date_str.startswith('20'):
-                date_cols.append({'index': j, 'date': date_str})
-        except Exception as e:
-            logger.warning(f"Impossible de parser la date {col_value}: {e}")
-            continue
-
-    # Parcours des lignes de données
-    current_room = None
-    current_stock_data = {}
-    
-    for i in range(1, df.shape[0]):
-        row = df.iloc[i].tolist()
-        
-        # Gestion des cellules vides
-        if all(pd.isna(cell) for cell in row[:3]):
-            continue
-            
-        # Détection du nom de la chambre (colonne 0)
-        if pd.notna(row[0]) and str(row[0]).strip():
-            current_room = str(row[0]).strip()
-            
-        if not current_room:
-            continue
-            
-        # Initialisation de la structure pour cette chambre
-        if current_room not in hotel_data:
-            hotel_data[current_room] = {'stock': {}, 'plans': {}}
-            
-        # Détection du type de ligne
-        descriptor = str(row[2]).strip().lower() if pd.notna(row[2]) else ""
-        
-        if 'left for sale' in descriptor:
-            # Ligne de stock
-            current_stock_data = {}
-            for dc in date_cols:
-                if dc['index'] < len(row):
-                    stock_value = row[dc['index']]
-                    current_stock_data[dc['date']] = safe_int(stock_value)
-            
-            hotel_data[current_room]['stock'] = current_stock_data
-            
-        elif 'price' in descriptor and current_stock_data:
-            # Ligne de prix
-            plan_name = str(row[1]).strip() if pd.notna(row[1]) else "UNNAMED_PLAN"
-            
-            if plan_name not in hotel_data[current_room]['plans']:
-                hotel_data[current_room]['plans'][plan_name] = {}
-                
-            for dc in date_cols:
-                if dc['index'] < len(row):
-                    price_value = row[dc['index']]
-                    try:
-                        if pd.notna(price_value):
-                            price_str = str(price_value).replace(',', '.')
-                            price_clean = re.sub(r'[^\d.]', '', price_str)
-                            hotel_data[current_room]['plans'][plan_name][dc['date']] = float(price_clean)
-                        else:
-                            hotel_data[current_room]['plans'][plan_name][dc['date']] = None
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Erreur conversion prix {price_value}: {e}")
-                        hotel_data[current_room]['plans'][plan_name][dc['date']] = None
+    # Colonnes descriptives (chambre, plan, type de ligne) nettoyées en une seule passe
+    missing = pd.isna(cells[:, :3])
+    empty_rows = missing.all(axis=1)
+    labels = pd.DataFrame(cells[:, :3]).astype(str).apply(lambda col: col.str.strip()).to_numpy()
+    room_col = np.where(missing[:, 0], "", labels[:, 0])
+    plan_col = np.where(missing[:, 1], "UNNAMED_PLAN", labels[:, 1])
+    
+    # Type de chaque ligne (stock ou prix) déterminé en bloc sur la colonne descriptive
+    descriptors = pd.Series(np.where(missing[:, 2], "", labels[:, 2]), dtype=object).str.lower()
+    is_stock = descriptors.str.contains('left for sale', regex=False).to_numpy(dtype=bool)
+    is_price = descriptors.str.contains('price', regex=False).to_numpy(dtype=bool)
+    
+    # Chambre de chaque ligne : le nom (colonne 0) est propagé aux lignes suivantes. La
+    # ligne d'en-tête et les lignes vides ne portent aucune chambre
+    room_labels = pd.Series(room_col, dtype=object).where(room_col != "")
+    room_labels.iloc[0] = np.nan
+    rooms = room_labels.ffill().to_numpy()
+    in_room = ~empty_rows & pd.notna(rooms)
+    in_room[0] = False
+    
+    # Initialisation de la structure des chambres, dans l'ordre d'apparition
+    for room in pd.unique(rooms[in_room]):
+        hotel_data[room] = {'stock': {}, 'plans': {}}
+    
+    # Lignes de stock, puis lignes de prix situées après la première ligne de stock du fichier
+    stock_mask = in_room & is_stock
+    price_mask = in_room & is_price & ~is_stock & (np.cumsum(stock_mask) > 0) & bool(date_keys)
+    stock_rows = np.flatnonzero(stock_mask)
+    price_rows = np.flatnonzero(price_mask)
+    stock_rooms = rooms[stock_rows]
+    price_plans = [
+        hotel_data[room]['plans'].setdefault(plan_name, {})
+        for room, plan_name in zip(rooms[price_rows], plan_col[price_rows])
+    ]
+
+    # 2e passage : conversion vectorisée de tous les stocks puis de tous les prix en un seul appel
+    n_dates = len(date_keys)
+    
+    stock_cells = cells[np.ix_(stock_rows, date_indices)]
+    stock_values = parse_stock_cells(stock_cells.ravel()).reshape(len(stock_rows), n_dates).tolist()
+    for room, values in zip(stock_rooms, stock_values):
+        hotel_data[room]['stock'] = dict(zip(date_keys, values))
+    
+    price_cells = cells[np.ix_(price_rows, date_indices)]
+    prices = parse_price_cells(price_cells.ravel()).astype(object)
+    prices[pd.isna(prices)] = None
+    for plan_prices, values in zip(price_plans, prices.reshape(len(price_rows), n_dates).tolist()):
+        plan_prices.update(zip(date_keys, values))
 
     logger.info(f"Parsing terminé: {len(hotel_data)} chambres, {len(date_cols)} dates")
     return {
@@ -251,13 +377,15 @@ def parse_sheet_to_structure(df: pd.DataFrame) -> dict:
 
 # --- 7. ENDPOINTS DE L'API ---
 
+# Les endpoints de statut, appelés en boucle par les sondes, renvoient directement une
+# réponse déjà sérialisée pour éviter le passage par jsonable_encoder
 @app.get("/", tags=["Status"])
 def read_root(): 
-    return {
+    return ORJSONResponse({
         "status": "Hotel RM API v8.0 is running", 
         "timestamp": datetime.now().isoformat(),
         "cors_enabled": True
-    }
+    })
 
 @app.get("/health", tags=["Status"])
 def health_check():
@@ -270,13 +398,13 @@ def health_check():
         logger.error(f"Database health check failed: {e}")
         db_status = "unhealthy"
     
-    return {
+    return ORJSONResponse({
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
         "database": db_status,
         "version": "8.0",
         "cors": "enabled"
-    }
+    })
 
 # --- Gestion des Hôtels ---
 @app.post("/hotels", tags=["Hotel Management"])
@@ -294,54 +422,102 @@ def create_hotel(hotel_id: str = Query(..., min_length=3)):
 @app.get("/hotels", tags=["Hotel Management"], response_model=List[str])
 def get_all_hotels():
     with Session(engine) as session:
-        hotels = [h.hotel_id for h in session.exec(select(Hotel)).all()]
+        hotels = list(session.exec(select(Hotel.hotel_id)).all())
         logger.info(f"Liste des hôtels récupérée: {len(hotels)} hôtels")
-        return hotels
+        # Liste de chaînes issue de la base : pas besoin de revalider via response_model
+        return ORJSONResponse(hotels)
 
 @app.delete("/hotels/{hotel_id}", tags=["Hotel Management"])
 def delete_hotel(hotel_id: str):
     hotel_id = decode_hotel_id(hotel_id)
     with Session(engine) as session:
-        hotel = session.get(Hotel, hotel_id)
-        if not hotel: 
+        # Suppressions directes en SQL : pas de SELECT préalable ni de chargement des objets
+        deleted = session.exec(delete(Hotel).where(Hotel.hotel_id == hotel_id))
+        if deleted.rowcount == 0: 
             raise HTTPException(status_code=404, detail="Hôtel non trouvé.")
         
-        config = session.exec(select(HotelConfig).where(HotelConfig.hotel_id == hotel_id)).first()
-        if config: 
-            session.delete(config)
+        session.exec(delete(HotelConfig).where(HotelConfig.hotel_id == hotel_id))
         
-        data_path = os.path.join(DATA_DIR, f'{hotel_id}_data.json')
-        if os.path.exists(data_path): 
-            os.remove(data_path)
+        try:
+            os.remove(hotel_data_path(hotel_id))
+        except FileNotFoundError:
+            pass
+        _hotel_data_cache.pop(hotel_id, None)
+        _hotel_bytes_cache.pop(hotel_id, None)
         
-        session.delete(hotel)
         session.commit()
         
     logger.info(f"Hôtel supprimé: {hotel_id}")
     return {"status": "ok", "message": f"Hôtel '{hotel_id}' et ses données supprimés."}
 
 # --- Gestion des Fichiers ---
+def _check_upload_size(file: UploadFile):
+    """Contrôle la taille réelle de l'upload (Content-Length peut être absent ou faux)"""
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Fichier trop volumineux (maximum {MAX_UPLOAD_BYTES} octets)")
+
+def _read_and_parse_upload(fileobj, filename: str) -> dict:
+    """Lit et parse un fichier Excel/CSV uploadé (appel bloquant, à exécuter hors de la boucle)"""
+    if filename.lower().endswith('.xlsx'):
+        # Moteur calamine (Rust) : lecture XLSX bien plus rapide et moins gourmande qu'openpyxl
+        df = pd.read_excel(fileobj, header=None, engine='calamine')
+    else:
+        try:
+            # Moteur PyArrow : lecture multi-thread vers des colonnes Arrow
+            df = pd.read_csv(
+                fileobj, header=None, encoding='utf-8', sep=';',
+                engine='pyarrow', dtype_backend='pyarrow'
+            )
+            # Colonnes descriptives (chambre, plan, type de ligne, source en A1) ramenées aux types du
+            # moteur C pour garder les mêmes clés : un plan "1" vaut 1.0 (int64 nullable chez PyArrow)
+            # et une cellule vide NaN (et non <NA>)
+            for col in df.columns[:3]:
+                labels = df[col]
+                if pd.api.types.is_integer_dtype(labels) and labels.hasnans:
+                    df[col] = labels.astype('float64')
+                else:
+                    df[col] = labels.astype(object).where(labels.notna(), np.nan)
+        except pd.errors.ParserError:
+            # PyArrow refuse les lignes de longueur variable, que le moteur C complète par NaN
+            fileobj.seek(0)
+            df = pd.read_csv(fileobj, header=None, encoding='utf-8', sep=';')
+    
+    return parse_sheet_to_structure(df)
+
 @app.post('/upload/excel', tags=["Uploads"])
 async def upload_excel(hotel_id: str = Query(...), file: UploadFile = File(...)):
     hotel_id = decode_hotel_id(hotel_id)
     
     if not file.filename.lower().endswith(('.xlsx', '.csv')):
         raise HTTPException(status_code=400, detail="Format non supporté. Utilisez .xlsx ou .csv")
+    _check_upload_size(file)
     
     try:
-        content = await file.read()
-        logger.info(f"Upload Excel/CSV pour {hotel_id}, taille: {len(content)} bytes")
+        logger.info(f"Upload Excel/CSV pour {hotel_id}, taille: {file.size} bytes")
         
-        if file.filename.lower().endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(content), header=None)
-        else:
-            df = pd.read_csv(io.BytesIO(content), header=None, encoding='utf-8', sep=';')
-            
-        parsed = parse_sheet_to_structure(df)
-        out_path = os.path.join(DATA_DIR, f'{hotel_id}_data.json')
+        # Lecture directe depuis le fichier temporaire de l'upload (déjà écrit sur disque
+        # par Starlette au-delà de 1 Mo), sans recopier tout le contenu en mémoire
+        await file.seek(0)
+        # Lecture et parsing (CPU) dans un thread : la boucle continue de servir les autres requêtes
+        parsed = await asyncio.to_thread(_read_and_parse_upload, file.file, file.filename)
+        out_path = hotel_data_path(hotel_id)
         
-        with open(out_path, 'w', encoding='utf-8') as f: 
-            json.dump(parsed, f, indent=2, ensure_ascii=False)
+        # Écriture dans un fichier temporaire propre à cette requête puis remplacement atomique :
+        # une lecture concurrente de /data ne voit jamais un fichier à moitié écrit, et deux
+        # uploads simultanés pour le même hôtel ne se partagent pas le fichier temporaire
+        fd, tmp_path = tempfile.mkstemp(dir=DATA_DIR, prefix=f"{hotel_id}_", suffix=".tmp")
+        try:
+            # mkstemp crée le fichier en 0600 : on rétablit les droits habituels des fichiers de données
+            os.chmod(tmp_path, 0o644)
+            async with aiofiles.open(fd, 'wb') as f:
+                await f.write(orjson.dumps(parsed, option=orjson.OPT_INDENT_2))
+            await asyncio.to_thread(os.replace, tmp_path, out_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
         
         logger.info(f"Données sauvegardées pour {hotel_id}: {len(parsed.get('rooms', {}))} chambres")
         
@@ -360,6 +536,7 @@ async def upload_excel(hotel_id: str = Query(...), file: UploadFile = File(...))
 @app.post('/upload/config', tags=["Uploads"])
 async def upload_config(hotel_id: str = Query(...), file: UploadFile = File(...)):
     hotel_id = decode_hotel_id(hotel_id)
+    _check_upload_size(file)
     
     try:
         content = await file.read()
@@ -367,8 +544,8 @@ async def upload_config(hotel_id: str = Query(...), file: UploadFile = File(...)
         
         # Validation du contenu JSON
         try:
-            parsed = json.loads(content.decode('utf-8'))
-        except json.JSONDecodeError as e:
+            parsed = orjson.loads(content)
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON invalide pour {hotel_id}: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Fichier JSON invalide: {str(e)}")
         
@@ -381,12 +558,13 @@ async def upload_config(hotel_id: str = Query(...), file: UploadFile = File(...)
         if file_hotel_id and file_hotel_id != hotel_id:
             logger.warning(f"Incohérence ID: fichier={file_hotel_id}, paramètre={hotel_id}")
         
+        # Le contenu a été validé par orjson : il est stocké tel quel, sans re-sérialisation
+        config_json = content.decode('utf-8')
+        # Upsert en une seule requête (hotel_id est unique) : ni SELECT préalable ni objet ORM
+        stmt = upsert_insert(HotelConfig).values(hotel_id=hotel_id, config_json=config_json)
+        stmt = stmt.on_conflict_do_update(index_elements=['hotel_id'], set_={'config_json': stmt.excluded.config_json})
         with Session(engine) as session:
-            existing = session.exec(select(HotelConfig).where(HotelConfig.hotel_id == hotel_id)).first()
-            if existing: 
-                existing.config_json = json.dumps(parsed, ensure_ascii=False, indent=2)
-            else: 
-                session.add(HotelConfig(hotel_id=hotel_id, config_json=json.dumps(parsed, ensure_ascii=False, indent=2)))
+            session.exec(stmt)
             session.commit()
             
         logger.info(f"Config sauvegardée pour {hotel_id}: {len(parsed.get('partners', {}))} partenaires")
@@ -405,56 +583,106 @@ async def upload_config(hotel_id: str = Query(...), file: UploadFile = File(...)
         raise HTTPException(status_code=500, detail=f"Erreur de sauvegarde de la config: {str(e)}")
 
 # --- Récupération des Données ---
-@app.get('/data', tags=["Data"])
-def get_data(hotel_id: str = Query(...)):
-    hotel_id = decode_hotel_id(hotel_id)
-    path = os.path.join(DATA_DIR, f'{hotel_id}_data.json')
-    
-    if not os.path.exists(path): 
+def _hotel_data_not_found(hotel_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404, 
+        detail=f"Données de planning introuvables pour '{hotel_id}'. Veuillez d'abord uploader un fichier Excel."
+    )
+
+def _read_hotel_bytes(hotel_id: str) -> bytes:
+    """Lit le fichier de données brut (appel bloquant, à exécuter hors de la boucle)"""
+    with open(hotel_data_path(hotel_id), 'rb') as f:
+        return f.read()
+
+def _read_hotel_data(hotel_id: str) -> dict:
+    """Lit et décode le fichier de données (appel bloquant, à exécuter hors de la boucle)"""
+    # Lecture en binaire : orjson décode directement les octets, sans passe de décodage UTF-8
+    with open(hotel_data_path(hotel_id), 'rb') as f:
+        return orjson.loads(f.read())
+
+async def _load_hotel_data(hotel_id: str) -> dict:
+    """Charge les données de planning d'un hôtel (ID déjà décodé). Le dict renvoyé est partagé : lecture seule"""
+    try:
+        stat = os.stat(hotel_data_path(hotel_id))
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = _hotel_data_cache.get(hotel_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        data = await asyncio.to_thread(_read_hotel_data, hotel_id)
+        _hotel_data_cache[hotel_id] = (key, data)
+        return data
+    except FileNotFoundError:
+        raise _hotel_data_not_found(hotel_id)
+    except Exception as e:
+        logger.error(f"Erreur lecture données pour {hotel_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur de lecture des données: {str(e)}")
+
+def _fetch_config_json(hotel_id: str) -> Optional[str]:
+    """Lit le JSON de configuration brut en base (appel bloquant, à exécuter hors de la boucle)"""
+    with Session(engine) as session:
+        cfg = session.exec(select(HotelConfig).where(HotelConfig.hotel_id == hotel_id)).first()
+        return cfg.config_json if cfg else None
+
+async def _load_hotel_config_json(hotel_id: str) -> str:
+    """Renvoie le JSON de configuration brut d'un hôtel, ou une 404 s'il n'existe pas"""
+    config_json = await asyncio.to_thread(_fetch_config_json, hotel_id)
+    if config_json is None: 
         raise HTTPException(
             status_code=404, 
-            detail=f"Données de planning introuvables pour '{hotel_id}'. Veuillez d'abord uploader un fichier Excel."
+            detail=f"Configuration introuvable pour '{hotel_id}'. Veuillez d'abord uploader un fichier JSON de configuration."
         )
-    
+    return config_json
+
+async def _load_hotel_config(hotel_id: str) -> dict:
+    """Charge la configuration d'un hôtel (ID déjà décodé)"""
+    config_json = await _load_hotel_config_json(hotel_id)
     try:
-        with open(path, 'r', encoding='utf-8') as f: 
-            data = json.load(f)
-        logger.info(f"Données chargées pour {hotel_id}")
-        return data
+        return orjson.loads(config_json)
+    except Exception as e:
+        logger.error(f"Erreur parsing config pour {hotel_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur de lecture de la configuration: {str(e)}")
+
+@app.get('/data', tags=["Data"])
+async def get_data(hotel_id: str = Query(...)):
+    hotel_id = decode_hotel_id(hotel_id)
+    try:
+        stat = os.stat(hotel_data_path(hotel_id))
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = _hotel_bytes_cache.get(hotel_id)
+        if cached is not None and cached[0] == key:
+            content = cached[1]
+        else:
+            content = await asyncio.to_thread(_read_hotel_bytes, hotel_id)
+            _hotel_bytes_cache[hotel_id] = (key, content)
+    except FileNotFoundError:
+        raise _hotel_data_not_found(hotel_id)
     except Exception as e:
         logger.error(f"Erreur lecture données pour {hotel_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur de lecture des données: {str(e)}")
+    
+    # Le fichier sur disque est déjà le JSON final : octets renvoyés tels quels, sans parsing ni re-sérialisation
+    logger.info(f"Données chargées pour {hotel_id}")
+    return Response(content=content, media_type='application/json')
 
 @app.get('/config', tags=["Data"])
-def get_config(hotel_id: str = Query(...)):
+async def get_config(hotel_id: str = Query(...)):
     hotel_id = decode_hotel_id(hotel_id)
-    
-    with Session(engine) as session:
-        cfg = session.exec(select(HotelConfig).where(HotelConfig.hotel_id == hotel_id)).first()
-        if not cfg: 
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Configuration introuvable pour '{hotel_id}'. Veuillez d'abord uploader un fichier JSON de configuration."
-            )
-        
-        try:
-            config_data = json.loads(cfg.config_json)
-            logger.info(f"Config chargée pour {hotel_id}")
-            return config_data
-        except Exception as e:
-            logger.error(f"Erreur parsing config pour {hotel_id}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Erreur de lecture de la configuration: {str(e)}")
+    config_json = await _load_hotel_config_json(hotel_id)
+    logger.info(f"Config chargée pour {hotel_id}")
+    # Le JSON stocké en base a été validé à l'upload : il est renvoyé tel quel
+    return Response(content=config_json, media_type='application/json')
 
 # --- NOUVEAU: Plans par partenaire ---
 @app.get("/plans/partner", tags=["Plans"])
-def get_plans_by_partner(hotel_id: str = Query(...), partner_name: str = Query(...), room_type: str = Query(...)):
+async def get_plans_by_partner(hotel_id: str = Query(...), partner_name: str = Query(...), room_type: str = Query(...)):
     """Récupère les plans tarifaires disponibles pour un partenaire et une chambre spécifiques"""
     try:
         hotel_id = decode_hotel_id(hotel_id)
         
         # Charger les données
-        hotel_data = get_data(hotel_id)
-        hotel_config = get_config(hotel_id)
+        hotel_data = await _load_hotel_data(hotel_id)
+        hotel_config = await _load_hotel_config(hotel_id)
         
         # Vérifier que la chambre existe
         room_data = hotel_data.get("rooms", {}).get(room_type)
@@ -515,16 +743,16 @@ async def simulate(request: SimulateIn):
         logger.info(f"Simulation demandée pour {request.hotel_id}, chambre: {request.room}, plan: {request.plan}")
 
         # Validation des dates
-        dstart = datetime.strptime(request.start, '%Y-%m-%d').date()
-        dend = datetime.strptime(request.end, '%Y-%m-%d').date()
+        dstart = parse_request_date(request.start)
+        dend = parse_request_date(request.end)
         
         if dstart >= dend:
             raise HTTPException(status_code=400, detail="La date de début doit être avant la date de fin")
 
         # Récupération des données
-        hotel_data_full = get_data(request.hotel_id)
+        hotel_data_full = await _load_hotel_data(request.hotel_id)
         hotel_data = hotel_data_full.get("rooms", {})
-        hotel_config = get_config(request.hotel_id)
+        hotel_config = await _load_hotel_config(request.hotel_id)
         
         room_data = hotel_data.get(request.room)
         if not room_data:
@@ -568,12 +796,12 @@ async def simulate(request: SimulateIn):
 
         # Calculs par date
         results = []
-        current_date = dstart
+        stock_data = room_data.get("stock", {})
+        period = [dstart + timedelta(days=i) for i in range((dend - dstart).days)]
         
-        while current_date < dend:
-            date_key = current_date.strftime("%Y-%m-%d")
+        for current_date, date_key in zip(period, [d.isoformat() for d in period]):
             gross_price = plan_data.get(date_key)
-            stock = room_data.get("stock", {}).get(date_key, 0)
+            stock = stock_data.get(date_key, 0)
             
             # Application des remises en cascade (d'abord remise partenaire, puis promo)
             price_after_partner_discount = gross_price
@@ -591,13 +819,9 @@ async def simulate(request: SimulateIn):
             # Détermination de la disponibilité
             availability = "Disponible" if stock > 0 else "Complet"
             
-            # Format de date avec jour de la semaine en français
-            jours_semaine = ["lun", "mar", "mer", "jeu", "ven", "sam", "dim"]
-            date_display = f"{jours_semaine[current_date.weekday()]} {current_date.strftime('%d/%m')}"
-            
             results.append({
                 "date": date_key,
-                "date_display": date_display,
+                "date_display": format_date_display(current_date),
                 "stock": stock,
                 "gross_price": gross_price,
                 "price_after_partner_discount": price_after_partner_discount,
@@ -606,7 +830,6 @@ async def simulate(request: SimulateIn):
                 "net_price": net_price,
                 "availability": availability
             })
-            current_date += timedelta(days=1)
 
         # Calcul des totaux
         valid_results = [r for r in results if r.get("gross_price") is not None]
@@ -658,25 +881,22 @@ async def get_availability(request: AvailabilityRequest):
         hotel_id = decode_hotel_id(request.hotel_id)
         
         # Validation des dates
-        start_date = datetime.strptime(request.start_date, '%Y-%m-%d').date()
-        end_date = datetime.strptime(request.end_date, '%Y-%m-%d').date()
+        start_date = parse_request_date(request.start_date)
+        end_date = parse_request_date(request.end_date)
         
         if start_date >= end_date:
             raise HTTPException(status_code=400, detail="La date de début doit être avant la date de fin")
 
         # Charger les données
-        hotel_data_full = get_data(hotel_id)
+        hotel_data_full = await _load_hotel_data(hotel_id)
         hotel_data = hotel_data_full.get("rooms", {})
         
         # Filtrer les chambres si spécifié
         room_types = request.room_types if request.room_types else list(hotel_data.keys())
         
         # Générer toutes les dates de la période
-        dates_in_period = []
-        current_date = start_date
-        while current_date < end_date:
-            dates_in_period.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
+        period = [start_date + timedelta(days=i) for i in range((end_date - start_date).days)]
+        dates_in_period = [d.isoformat() for d in period]
         
         # Préparer les données de disponibilité
         availability_data = {}
@@ -688,11 +908,7 @@ async def get_availability(request: AvailabilityRequest):
                     availability_data[room_name][date_str] = room_info.get("stock", {}).get(date_str, 0)
         
         # Format des dates pour l'affichage
-        date_display = {}
-        for date_str in dates_in_period:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-            jours_semaine = ["lun", "mar", "mer", "jeu", "ven", "sam", "dim"]
-            date_display[date_str] = f"{jours_semaine[date_obj.weekday()]} {date_obj.strftime('%d/%m')}"
+        date_display = {date_str: format_date_display(d) for date_str, d in zip(dates_in_period, period)}
         
         return {
             "hotel_id": hotel_id,
@@ -712,58 +928,92 @@ async def get_availability(request: AvailabilityRequest):
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des disponibilités: {str(e)}")
 
 # --- Export Excel ---
-@app.post("/export/simulation", tags=["Export"])
-async def export_simulation(data: dict):
-    """Exporte les résultats de simulation en format Excel"""
+EXCEL_HEADER_FONT = Font(bold=True)
+
+def _append_excel_header(ws, headers: List[str]):
+    """Ajoute une ligne d'en-tête en gras à une feuille en mode write-only"""
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = EXCEL_HEADER_FONT
+        cells.append(cell)
+    ws.append(cells)
+
+def _build_simulation_excel(data: dict) -> io.BytesIO:
+    """Construit le classeur Excel d'une simulation en mémoire (appel bloquant)"""
+    # Mode write-only : les lignes sont écrites en flux, sans graphe de cellules en mémoire
+    wb = Workbook(write_only=True)
+    
+    # Feuille de détail par jour
+    ws_detail = wb.create_sheet('Détail par jour')
+    _append_excel_header(ws_detail, [
+        "Date", "Prix Brut (€)", "Prix Après Remise (€)", "Commission (€)",
+        "Prix Net (€)", "Stock", "Disponibilité"
+    ])
+    for day in data.get("results", []):
+        ws_detail.append([
+            day.get("date_display", day.get("date")),
+            day.get("gross_price"),
+            day.get("price_after_promo"),
+            day.get("commission"),
+            day.get("net_price"),
+            day.get("stock"),
+            day.get("availability")
+        ])
+    
+    # Ajout du résumé
+    summary = data.get("summary", {})
+    sim_info = data.get("simulation_info", {})
+    
+    summary_data = {
+        "Chambre": sim_info.get("room", ""),
+        "Plan Tarifaire": sim_info.get("plan", ""),
+        "Partenaire": sim_info.get("partner", "Direct"),
+        "Période": f"{sim_info.get('start_date', '')} au {sim_info.get('end_date', '')}",
+        "Nuits": sim_info.get("nights", 0),
+        "Sous-Total Brut (€)": summary.get("subtotal_brut", 0),
+        "Remises et Promos (€)": summary.get("total_discount", 0),
+        "Total Commission (€)": summary.get("total_commission", 0),
+        "Total Net (€)": summary.get("total_net", 0)
+    }
+    
+    ws_summary = wb.create_sheet('Résumé')
+    _append_excel_header(ws_summary, list(summary_data.keys()))
+    ws_summary.append(list(summary_data.values()))
+    
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+@app.post(
+    "/export/simulation",
+    tags=["Export"],
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": {"type": "object"}}}}}
+)
+async def export_simulation(request: Request):
+    """Exporte les résultats de simulation en format Excel.
+
+    Le corps attendu est la réponse de `/simulate` (`simulation_info`, `results`, `summary`).
+    Il est décodé directement avec orjson, sans validation Pydantic de la liste `results`.
+    """
     try:
-        output = io.BytesIO()
-        
-        # Création du DataFrame principal
-        df_data = []
-        for day in data.get("results", []):
-            df_data.append({
-                "Date": day.get("date_display", day.get("date")),
-                "Prix Brut (€)": day.get("gross_price"),
-                "Prix Après Remise (€)": day.get("price_after_promo"),
-                "Commission (€)": day.get("commission"),
-                "Prix Net (€)": day.get("net_price"),
-                "Stock": day.get("stock"),
-                "Disponibilité": day.get("availability")
-            })
-        
-        df = pd.DataFrame(df_data)
-        
-        # Création du fichier Excel en mémoire
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Détail par jour', index=False)
-            
-            # Ajout du résumé
-            summary = data.get("summary", {})
-            sim_info = data.get("simulation_info", {})
-            
-            summary_data = {
-                "Chambre": [sim_info.get("room", "")],
-                "Plan Tarifaire": [sim_info.get("plan", "")],
-                "Partenaire": [sim_info.get("partner", "Direct")],
-                "Période": [f"{sim_info.get('start_date', '')} au {sim_info.get('end_date', '')}"],
-                "Nuits": [sim_info.get("nights", 0)],
-                "Sous-Total Brut (€)": [summary.get("subtotal_brut", 0)],
-                "Remises et Promos (€)": [summary.get("total_discount", 0)],
-                "Total Commission (€)": [summary.get("total_commission", 0)],
-                "Total Net (€)": [summary.get("total_net", 0)]
-            }
-            
-            summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Résumé', index=False)
-        
-        output.seek(0)
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Corps JSON invalide: {str(e)}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Le corps de la requête doit être un objet JSON")
+    
+    try:
+        # Génération du classeur hors de la boucle d'événements
+        output = await asyncio.to_thread(_build_simulation_excel, data)
         
         # Retour en streaming
-        filename = f"simulation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        filename = f"simulation_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
         logger.info(f"Export Excel généré: {filename}")
         return StreamingResponse(
             output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
         
@@ -777,19 +1027,34 @@ def check_files_status(hotel_id: str = Query(...)):
     """Vérifie l'existence des fichiers pour un hôtel"""
     hotel_id = decode_hotel_id(hotel_id)
     
-    data_path = os.path.join(DATA_DIR, f'{hotel_id}_data.json')
+    data_path = hotel_data_path(hotel_id)
     config_exists = False
     
+    # Un seul appel stat() donne à la fois l'existence et la taille du fichier
+    try:
+        data_file_size = os.stat(data_path).st_size
+    except FileNotFoundError:
+        data_file_size = None
+    
     with Session(engine) as session:
-        config_exists = session.exec(select(HotelConfig).where(HotelConfig.hotel_id == hotel_id)).first() is not None
+        config_exists = session.exec(select(HotelConfig.id).where(HotelConfig.hotel_id == hotel_id)).first() is not None
     
     return {
         "hotel_id": hotel_id,
-        "data_file_exists": os.path.exists(data_path),
+        "data_file_exists": data_file_size is not None,
+        "data_file_size": data_file_size,
         "config_exists": config_exists,
         "data_file_path": data_path
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop + httptools sont fournis par uvicorn[standard]
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
\ No newline at end of file